@@ -1,21 +1,50 @@
 import argparse
 import logging
 import os
-from collections import namedtuple
+import re
 from datetime import datetime
+from functools import lru_cache
 
 FORMAT = "%(asctime)-15s [%(levelname)8s] %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.INFO)
 
-Hand = namedtuple("Hand", ["source", "seats"])
-Seat = namedtuple("Seat", ["number", "chips"])
-
 RESULT = "result"
 REST = "rest"
 
+SEP = os.path.sep
+
 LZN = 3
 LZW = 2
 
+NEWLINE = os.linesep.encode()
+HAND_END = NEWLINE * 4
+
+BUFFER_SIZE = 1 << 20
+SEAT_CACHE_SIZE = 1 << 17
+
+HAND_SEPARATOR = re.compile(rb"\n\s*\n")
+SEAT_PATTERN = re.compile(rb"Seat (\d+):.*?\((\d+) in chips\)")
+
+
+class Hand:
+    __slots__ = ("source", "seats")
+
+    def __init__(self, source, seats):
+        self.source = source
+        self.seats = seats
+
+
+class Seat:
+    __slots__ = ("number", "chips")
+
+    def __init__(self, number, chips):
+        self.number = number
+        self.chips = chips
+
+
+# Well-formed hand that cannot pass the seats/chips filter, its lines are not kept
+FILTERED_HAND = Hand([], [])
+
 
 class HandsStructure:
     def __init__(self, path):
@@ -30,122 +59,128 @@ class HandsStructure:
         errors = 0
         hands_weird = []
 
+        seat_mask = ((1 << seats) - 1) << 1
+        prefix_normal = f"{result_folder}{SEP}{RESULT}-"
         ni, nk = 0, 0
-        result_file_normal = self.__file_name__(result_folder, RESULT, nk, LZN)
-        handler_normal = open(result_file_normal, "w", encoding="utf-8")
-        logging.info("Writing results into '{}'".format(result_file_normal))
-        for hand in self.__get_hands__():
+        batch_normal = []
+        result_file_normal = self.__file_name__(prefix_normal, nk, LZN)
+        handler_normal = open(result_file_normal, "wb", buffering=BUFFER_SIZE)
+        logging.info("Writing results into '%s'", result_file_normal)
+        for hand in self.__get_hands__(seats, chips):
             total += 1
             if not hand:
                 errors += 1
                 continue
-            if len(hand.seats) == seats and all(map(lambda seat: seat.chips == chips, hand.seats)):
-                if sorted(map(lambda seat: seat.number, hand.seats)) == [i + 1 for i in range(seats)]:
+            if len(hand.seats) == seats and all(seat.chips == chips for seat in hand.seats):
+                mask = 0
+                for seat in hand.seats:
+                    mask |= 1 << seat.number
+                if mask == seat_mask:
                     ni += 1
-                    for line in hand.source:
-                        handler_normal.write("{}\n".format(line))
-                    handler_normal.write("\n\n\n")
+                    batch_normal.append(hand)
                     if ni % batch == 0:
                         nk += 1
+                        write_batch(handler_normal, batch_normal)
                         handler_normal.close()
-                        result_file_normal = self.__file_name__(result_folder, RESULT, nk, LZN)
-                        handler_normal = open(result_file_normal, "w", encoding="utf-8")
-                        logging.info("Writing results into '{}'".format(result_file_normal))
+                        batch_normal.clear()
+                        result_file_normal = self.__file_name__(prefix_normal, nk, LZN)
+                        handler_normal = open(result_file_normal, "wb", buffering=BUFFER_SIZE)
+                        logging.info("Writing results into '%s'", result_file_normal)
                 else:
                     hands_weird.append(hand)
+        write_batch(handler_normal, batch_normal)
         handler_normal.close()
 
         if hands_weird:
+            prefix_weird = f"{result_folder}{SEP}{REST}-"
             wk = 0
             for i in range(0, len(hands_weird), batch):
-                result_file_weird = self.__file_name__(result_folder, REST, wk, LZW)
-                logging.info("Writing rest into '{}'".format(result_file_weird))
-                with open(result_file_weird, "w", encoding="utf-8") as handler_wired:
-                    for hand in hands_weird[i:i + batch]:
-                        for line in hand.source:
-                            handler_wired.write("{}\n".format(line))
-                        handler_wired.write("\n\n\n")
+                result_file_weird = self.__file_name__(prefix_weird, wk, LZW)
+                logging.info("Writing rest into '%s'", result_file_weird)
+                with open(result_file_weird, "wb", buffering=BUFFER_SIZE) as handler_wired:
+                    write_batch(handler_wired, hands_weird[i:i + batch])
+                wk += 1
 
         logging.info("Done retrieving")
         logging.info("")
-        logging.info("All hands     = {}".format(total + errors))
-        logging.info("Handled hands = {}".format(total))
-        logging.info("  normal      = {}".format(ni))
-        logging.info("  weird       = {}".format(len(hands_weird)))
-        logging.info("  filtered    = {}".format(total - ni - len(hands_weird)))
-        logging.info("Error hands   = {}".format(errors))
-
-    def __get_hands__(self):
+        logging.info("All hands     = %s", total + errors)
+        logging.info("Handled hands = %s", total)
+        logging.info("  normal      = %s", ni)
+        logging.info("  weird       = %s", len(hands_weird))
+        logging.info("  filtered    = %s", total - ni - len(hands_weird))
+        logging.info("Error hands   = %s", errors)
+
+    def __get_hands__(self, seats, chips):
         for file in self.__files__:
-            yield from self.__parse_file__(file)
-
-    def __parse_file__(self, file):
-        hand_lines = []
-        with open(file, encoding="utf-8") as handler:
-            line = handler.readline()
-            while line:
-                line = line.strip()
-                if line:
-                    hand_lines.append(line)
-                elif hand_lines:
-                    yield self.__get_hand__(file, hand_lines)
-                line = handler.readline()
-
-        if hand_lines:
-            yield self.__get_hand__(file, hand_lines)
+            yield from self.__parse_file__(file, seats, chips)
+
+    def __parse_file__(self, file, seats, chips):
+        chips_marker = f"({chips} in chips)".encode()
+        with open(file, "rb") as handler:
+            text = handler.read()
+
+        for block in HAND_SEPARATOR.split(text):
+            if block.count(chips_marker) < seats:
+                if self.__parse_seats__(map(bytes.strip, block.split(b"\n"))):
+                    yield FILTERED_HAND
+                    continue
+            hand_lines = [line for line in map(bytes.strip, block.split(b"\n")) if line]
+            if hand_lines:
+                yield self.__get_hand__(file, hand_lines)
 
     def __get_hand__(self, file, hand_lines):
         hand = self.__parse_hand__(hand_lines)
         if not hand:
             logging.warning(
-                "Error parsing hand in file '{}' starting with '{}'".format(
-                    file.split(os.path.sep)[-1],
-                    hand_lines[0]
-                )
+                "Error parsing hand in file '%s' starting with '%s'",
+                os.path.basename(file),
+                hand_lines[0].decode("utf-8", "replace")
             )
-        hand_lines.clear()
         return hand
 
     def __parse_hand__(self, hand_lines):
+        seats = self.__parse_seats__(hand_lines)
+        return Hand(hand_lines, seats) if seats else None
+
+    @staticmethod
+    def __parse_seats__(hand_lines):
         seats = []
 
         seats_found = False
         for line in hand_lines:
-            if line.startswith("Seat"):
+            if line.startswith(b"Seat"):
                 seats_found = True
-                seat = self.__parse_seat__(line)
+                seat = HandsStructure.__parse_seat__(line)
                 if not seat:
                     return None
                 seats.append(seat)
             elif seats_found:
                 break
 
-        return Hand(hand_lines.copy(), seats) if seats else None
+        return seats
 
     @staticmethod
+    @lru_cache(maxsize=SEAT_CACHE_SIZE)
     def __parse_seat__(line):
-        parts = line.split()
-        if len(parts) < 2:
-            return None
-
-        ind = len(parts) + 10
-        for i, part in enumerate(parts):
-            if part.startswith("chip") and part.endswith(")") and i - 2 >= 0 and parts[i - 1] == "in":
-                ind = i - 2
-                break
-
-        try:
-            number = int(parts[1][:-1])
-            chips = int(parts[ind][1:])
-        except ValueError:
+        match = SEAT_PATTERN.match(line)
+        if not match:
             return None
 
-        return Seat(number, chips)
+        return Seat(int(match.group(1)), int(match.group(2)))
 
     def __collect_files__(self, path):
-        for root, _, files in os.walk(path):
-            for file in files:
-                self.__files__.append(os.path.join(root, file))
+        folders = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        self.__files__.append(entry.path)
+                    elif not entry.is_symlink():
+                        folders.append(entry.path)
+        except OSError:
+            return
+        for folder in folders:
+            self.__collect_files__(folder)
 
     @staticmethod
     def __create_result_folder__(result):
@@ -158,22 +193,29 @@ class HandsStructure:
             result_folder = os.path.join(result, "result-{}-{}".format(date, i))
         os.makedirs(result_folder)
 
-        logging.info("Done creating result folders '{}'".format(result_folder))
+        logging.info("Done creating result folders '%s'", result_folder)
 
         return result_folder
 
     @staticmethod
-    def __file_name__(result_folder, name, k, zeros):
-        return "{}{}{}-{}.txt".format(result_folder, os.path.sep, name, str(k).zfill(zeros))
+    def __file_name__(prefix, k, zeros):
+        return f"{prefix}{str(k).zfill(zeros)}.txt"
+
+
+def write_batch(handler, hands):
+    chunks = []
+    for hand in hands:
+        chunks.append(NEWLINE.join(hand.source))
+        chunks.append(HAND_END)
+    handler.write(b"".join(chunks))
 
 
 def parse_file_args(file):
     result = {}
     if os.path.exists(file):
         with open(file, encoding="utf-8") as handler:
-            config = handler.readlines()
-        for k, v in map(lambda s: s.split("=", 1), config):
-            result[k.strip()] = v.strip()
+            config = handler.read().splitlines()
+        result = {k.strip(): v.strip() for k, sep, v in (line.partition("=") for line in config) if sep}
 
     return result
 
@@ -212,11 +254,11 @@ def retrieve_hands(path, result, seats, chips, batch):
 
 def main():
     args = parse_args()
-    logging.info("Input folder:  {}".format(args.path))
-    logging.info("Result folder: {}".format(args.result))
-    logging.info("Seats:         {}".format(args.seats))
-    logging.info("Chips:         {}".format(args.chips))
-    logging.info("Batch size:    {}".format(args.batch))
+    logging.info("Input folder:  %s", args.path)
+    logging.info("Result folder: %s", args.result)
+    logging.info("Seats:         %s", args.seats)
+    logging.info("Chips:         %s", args.chips)
+    logging.info("Batch size:    %s", args.batch)
     logging.info("")
 
     retrieve_hands(args.path, args.result, args.seats, args.chips, args.batch)
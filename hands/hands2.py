@@ -1,15 +1,43 @@
 import argparse
 import logging
 import os
+import re
 from collections import namedtuple
 from datetime import datetime
+from functools import lru_cache, partial
+from multiprocessing import Pool
 
 FORMAT = "%(asctime)-15s [%(levelname)8s] %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.INFO)
 
 Hands = namedtuple("Hands", ["normal", "weird", "total", "errors"])
-Hand = namedtuple("Hand", ["source", "seats"])
-Seat = namedtuple("Seat", ["number", "chips"])
+
+SEP = os.path.sep
+
+NEWLINE = os.linesep.encode()
+HAND_END = NEWLINE * 4
+
+BUFFER_SIZE = 1 << 20
+SEAT_CACHE_SIZE = 1 << 17
+
+HAND_SEPARATOR = re.compile(rb"\n\s*\n")
+SEAT_PATTERN = re.compile(rb"Seat (\d+):.*?\((\d+) in chips\)")
+
+
+class Hand:
+    __slots__ = ("source", "seats")
+
+    def __init__(self, source, seats):
+        self.source = source
+        self.seats = seats
+
+
+class Seat:
+    __slots__ = ("number", "chips")
+
+    def __init__(self, number, chips):
+        self.number = number
+        self.chips = chips
 
 
 class HandsStructure:
@@ -21,133 +49,169 @@ class HandsStructure:
         logging.info("Start retrieving...")
         result_folder = self.__create_result_folder__(result)
 
+        prefix_normal = f"{result_folder}{SEP}result-"
+        prefix_weird = f"{result_folder}{SEP}rest-"
         hands_normal = []
         hands_weird = []
+        files_normal = []
+        files_weird = []
+        count_normal = 0
+        count_weird = 0
         total = 0
         errors = 0
 
-        for file in self.__files__:
-            hands = self.__get_hands__(file, seats, chips)
-            hands_normal.extend(hands.normal)
-            hands_weird.extend(hands.weird)
-            total += hands.total
-            errors += hands.errors
-
-        k = 0
-        lz = len(str(len(hands_normal) // batch + 1))
-        for i in range(0, len(hands_normal), batch):
-            result_file_normal = "{}{}{}-{}.txt".format(result_folder, os.path.sep, "result", str(k).zfill(lz))
-            logging.info("Writing results into '{}'".format(result_file_normal))
-            with open(result_file_normal, "w", encoding="utf-8") as handler:
-                for hand in hands_normal[i:i + batch]:
-                    for line in hand.source:
-                        handler.write("{}\n".format(line))
-                    handler.write("\n\n\n")
-            k += 1
-
+        get_hands = partial(HandsStructure.__get_hands__, seats=seats, chips=chips)
+        with Pool() as pool:
+            for hands in pool.imap(get_hands, self.__files__, chunksize=8):
+                hands_normal.extend(hands.normal)
+                hands_weird.extend(hands.weird)
+                count_normal += len(hands.normal)
+                count_weird += len(hands.weird)
+                total += hands.total
+                errors += hands.errors
+                while len(hands_normal) >= batch:
+                    result_file_normal = f"{prefix_normal}{len(files_normal)}.txt"
+                    HandsStructure.__write_hands__(result_file_normal, hands_normal[:batch])
+                    files_normal.append(result_file_normal)
+                    del hands_normal[:batch]
+                while len(hands_weird) >= batch:
+                    result_file_weird = f"{prefix_weird}{len(files_weird)}.txt"
+                    HandsStructure.__write_hands__(result_file_weird, hands_weird[:batch])
+                    files_weird.append(result_file_weird)
+                    del hands_weird[:batch]
+
+        if hands_normal:
+            result_file_normal = f"{prefix_normal}{len(files_normal)}.txt"
+            HandsStructure.__write_hands__(result_file_normal, hands_normal)
+            files_normal.append(result_file_normal)
         if hands_weird:
-            k = 0
-            lz = len(str(len(hands_weird) // batch + 1))
-            for i in range(0, len(hands_weird), batch):
-                result_file_weird = "{}{}{}-{}.txt".format(result_folder, os.path.sep, "rest", str(k).zfill(lz))
-                logging.info("Writing rest into '{}'".format(result_file_weird))
-                with open(result_file_weird, "w", encoding="utf-8") as handler:
-                    for hand in hands_weird[i:i + batch]:
-                        for line in hand.source:
-                            handler.write("{}\n".format(line))
-                        handler.write("\n\n\n")
+            result_file_weird = f"{prefix_weird}{len(files_weird)}.txt"
+            HandsStructure.__write_hands__(result_file_weird, hands_weird)
+            files_weird.append(result_file_weird)
+
+        for result_file_normal in HandsStructure.__pad_file_names__(prefix_normal, files_normal, count_normal, batch):
+            logging.info("Wrote results into '%s'", result_file_normal)
+        for result_file_weird in HandsStructure.__pad_file_names__(prefix_weird, files_weird, count_weird, batch):
+            logging.info("Wrote rest into '%s'", result_file_weird)
 
         logging.info("Done retrieving")
         logging.info("")
-        logging.info("All hands     = {}".format(total + errors))
-        logging.info("Handled hands = {}".format(total))
-        logging.info("  normal      = {}".format(len(hands_normal)))
-        logging.info("  weird       = {}".format(len(hands_weird)))
-        logging.info("  filtered    = {}".format(total - len(hands_normal) - len(hands_weird)))
-        logging.info("Error hands   = {}".format(errors))
-
-    def __get_hands__(self, file, seats, chips):
-        hands, errors = self.__parse_file__(file)
+        logging.info("All hands     = %s", total + errors)
+        logging.info("Handled hands = %s", total)
+        logging.info("  normal      = %s", count_normal)
+        logging.info("  weird       = %s", count_weird)
+        logging.info("  filtered    = %s", total - count_normal - count_weird)
+        logging.info("Error hands   = %s", errors)
+
+    @staticmethod
+    def __write_hands__(result_file, hands):
+        with open(result_file, "wb", buffering=BUFFER_SIZE) as handler:
+            write_batch(handler, hands)
+
+    @staticmethod
+    def __pad_file_names__(prefix, files, count, batch):
+        lz = len(str(count // batch + 1))
+        if lz == 1:
+            return files
+        padded = []
+        for k, file in enumerate(files):
+            padded_file = f"{prefix}{str(k).zfill(lz)}.txt"
+            os.replace(file, padded_file)
+            padded.append(padded_file)
+        return padded
+
+    @staticmethod
+    def __get_hands__(file, seats, chips):
+        hands, filtered, errors = HandsStructure.__parse_file__(file, seats, chips)
+        seat_mask = ((1 << seats) - 1) << 1
         normal = []
         weird = []
         for hand in hands:
-            if len(hand.seats) == seats and all(map(lambda seat: seat.chips == chips, hand.seats)):
-                if sorted(map(lambda seat: seat.number, hand.seats)) == [i + 1 for i in range(seats)]:
+            if len(hand.seats) == seats and all(seat.chips == chips for seat in hand.seats):
+                mask = 0
+                for seat in hand.seats:
+                    mask |= 1 << seat.number
+                if mask == seat_mask:
                     normal.append(hand)
                 else:
                     weird.append(hand)
 
-        return Hands(normal, weird, len(hands), errors)
+        return Hands(normal, weird, len(hands) + filtered, errors)
 
-    def __parse_file__(self, file):
+    @staticmethod
+    def __parse_file__(file, seats, chips):
         result = []
+        filtered = 0
         errors = 0
-
-        with open(file, encoding="utf-8") as handler:
-            lines = handler.readlines()
-        lines.append(" ")
-
-        hand_lines = []
-        for line in lines:
-            line = line.strip()
-            if line:
-                hand_lines.append(line)
-            elif hand_lines:
-                hand = self.__parse_hand__(hand_lines)
+        chips_marker = f"({chips} in chips)".encode()
+
+        with open(file, "rb") as handler:
+            text = handler.read()
+
+        for block in HAND_SEPARATOR.split(text):
+            if block.count(chips_marker) < seats:
+                if HandsStructure.__parse_seats__(map(bytes.strip, block.split(b"\n"))):
+                    filtered += 1
+                    continue
+            hand_lines = [line for line in map(bytes.strip, block.split(b"\n")) if line]
+            if hand_lines:
+                hand = HandsStructure.__parse_hand__(hand_lines)
                 if hand:
                     result.append(hand)
                 else:
                     errors += 1
                     logging.warning(
-                        "Error parsing hand in file '{}' starting with '{}'".format(
-                            file.split(os.path.sep)[-1],
-                            hand_lines[0]
-                        )
+                        "Error parsing hand in file '%s' starting with '%s'",
+                        os.path.basename(file),
+                        hand_lines[0].decode("utf-8", "replace")
                     )
-                hand_lines.clear()
 
-        return result, errors
+        return result, filtered, errors
+
+    @staticmethod
+    def __parse_hand__(hand_lines):
+        seats = HandsStructure.__parse_seats__(hand_lines)
+        return Hand(hand_lines, seats) if seats else None
 
-    def __parse_hand__(self, hand_lines):
+    @staticmethod
+    def __parse_seats__(hand_lines):
         seats = []
 
         seats_found = False
         for line in hand_lines:
-            if line.startswith("Seat"):
+            if line.startswith(b"Seat"):
                 seats_found = True
-                seat = self.__parse_seat__(line)
+                seat = HandsStructure.__parse_seat__(line)
                 if not seat:
                     return None
                 seats.append(seat)
             elif seats_found:
                 break
 
-        return Hand(hand_lines.copy(), seats) if seats else None
+        return seats
 
     @staticmethod
+    @lru_cache(maxsize=SEAT_CACHE_SIZE)
     def __parse_seat__(line):
-        parts = line.split()
-        if len(parts) < 2:
+        match = SEAT_PATTERN.match(line)
+        if not match:
             return None
 
-        ind = len(parts) + 10
-        for i, part in enumerate(parts):
-            if part.startswith("chip") and part.endswith(")") and i - 2 >= 0 and parts[i - 1] == "in":
-                ind = i - 2
-                break
-
-        try:
-            number = int(parts[1][:-1])
-            chips = int(parts[ind][1:])
-        except ValueError:
-            return None
-
-        return Seat(number, chips)
+        return Seat(int(match.group(1)), int(match.group(2)))
 
     def __collect_files__(self, path):
-        for root, _, files in os.walk(path):
-            for file in files:
-                self.__files__.append(os.path.join(root, file))
+        folders = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        self.__files__.append(entry.path)
+                    elif not entry.is_symlink():
+                        folders.append(entry.path)
+        except OSError:
+            return
+        for folder in folders:
+            self.__collect_files__(folder)
 
     @staticmethod
     def __create_result_folder__(result):
@@ -160,18 +224,25 @@ class HandsStructure:
             result_folder = os.path.join(result, "result-{}-{}".format(date, i))
         os.makedirs(result_folder)
 
-        logging.info("Done creating result folders '{}'".format(result_folder))
+        logging.info("Done creating result folders '%s'", result_folder)
 
         return result_folder
 
 
+def write_batch(handler, hands):
+    chunks = []
+    for hand in hands:
+        chunks.append(NEWLINE.join(hand.source))
+        chunks.append(HAND_END)
+    handler.write(b"".join(chunks))
+
+
 def parse_file_args(file):
     result = {}
     if os.path.exists(file):
         with open(file, encoding="utf-8") as handler:
-            config = handler.readlines()
-        for k, v in map(lambda s: s.split("=", 1), config):
-            result[k.strip()] = v.strip()
+            config = handler.read().splitlines()
+        result = {k.strip(): v.strip() for k, sep, v in (line.partition("=") for line in config) if sep}
 
     return result
 
@@ -199,6 +270,8 @@ def parse_args(config_file="config.txt"):
         args.chips = int(config_args.get("chips", "500"))
     if not args.batch:
         args.batch = int(config_args.get("batch", "1000"))
+    if args.batch <= 0:
+        raise ValueError("Batch size must be positive, got {}".format(args.batch))
 
     return args
 
@@ -210,11 +283,11 @@ def retrieve_hands(path, result, seats, chips, batch):
 
 def main():
     args = parse_args()
-    logging.info("Input folder:  {}".format(args.path))
-    logging.info("Result folder: {}".format(args.result))
-    logging.info("Seats:         {}".format(args.seats))
-    logging.info("Chips:         {}".format(args.chips))
-    logging.info("Batch size:    {}".format(args.batch))
+    logging.info("Input folder:  %s", args.path)
+    logging.info("Result folder: %s", args.result)
+    logging.info("Seats:         %s", args.seats)
+    logging.info("Chips:         %s", args.chips)
+    logging.info("Batch size:    %s", args.batch)
     logging.info("")
 
     retrieve_hands(args.path, args.result, args.seats, args.chips, args.batch)
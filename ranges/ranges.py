@@ -1,10 +1,17 @@
 import argparse
 import logging
+import mmap
 import os
-from collections import namedtuple, defaultdict
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from functools import partial
+from math import fsum
 from shutil import copyfile
-from statistics import median, mean
 
 FORMAT = "%(asctime)-15s [%(levelname)8s] %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.INFO)
@@ -12,12 +19,46 @@ logging.basicConfig(format=FORMAT, level=logging.INFO)
 Range = namedtuple("Range", ["max", "name"])
 File = namedtuple("File", ["name", "id", "path"])
 Bounty = namedtuple("Bounty", ["count", "value"])
-Stack = namedtuple("Stack", ["value", "chips"])
-Score = namedtuple("Score", ["value", "stack", "eliminates", "win"])
-Eliminate = namedtuple("Eliminate", ["multipliers", "values", "possibles"])
-HandStat = namedtuple("HandStat", ["eliminate", "win"])
 MAX_SCORE = 10000
 INFO_FILE = "info_file"
+BUFFER_SIZE = 1 << 20
+COPY_WORKERS = 8
+HAND_SEPARATOR = re.compile(rb"\n\s*\n")
+SEAT_PATTERN = re.compile(rb"Seat \d+: (.+?) \((\d+) in chips,\s*\D*?(\d\S*) bounty\)")
+
+
+@dataclass(slots=True, frozen=True)
+class Seat:
+    player: bytes
+    chips: int
+    bounty: float
+
+
+@dataclass(slots=True, frozen=True)
+class Stack:
+    value: float
+    chips: int
+
+
+@dataclass(slots=True, frozen=True)
+class Eliminate:
+    multipliers: list
+    values: list
+    possibles: list
+
+
+@dataclass(slots=True, frozen=True)
+class HandStat:
+    eliminate: Eliminate
+    win: bool
+
+
+@dataclass(slots=True, frozen=True)
+class Score:
+    value: float
+    stack: Stack
+    eliminates: list
+    win: bool
 
 
 class FileStructure:
@@ -27,14 +68,19 @@ class FileStructure:
         self.__collect_files__(path)
         self.__apply_mode__(mode)
 
-    def split(self, root, ranges, players, stack):
+    def split(self, root, ranges, players, stack, hardlink):
         logging.info("Start spitting...")
         range_map = self.__create_result_folder__(root, ranges)
         range_count = defaultdict(int)
 
-        range_stack = defaultdict(list)
-        range_eliminates = defaultdict(list)
-        range_wins = defaultdict(list)
+        range_stack_values = defaultdict(partial(array, "d"))
+        range_stack_chips = defaultdict(partial(array, "q"))
+        range_multipliers = defaultdict(Counter)
+        range_values = defaultdict(partial(array, "d"))
+        range_possibles = defaultdict(partial(array, "d"))
+        range_eliminates = defaultdict(int)
+        range_games = defaultdict(int)
+        range_wins = defaultdict(int)
 
         stats = {}
         for sf in self.stat_files:
@@ -44,81 +90,86 @@ class FileStructure:
 
         gfc = 0
         sfc = 0
-        for gf in self.game_files:
-            score = self.__parse_file__(gf, players, stack)
-            if score.value == -2:
-                logging.warning("Cannot get bounties from file={}, full path={}".format(gf.name, gf.path))
-                continue
-            if score.value < 0:
-                continue
-            if score.value > MAX_SCORE:
-                logging.warning("Score={} is too high file={}, full path={}".format(score.value, gf.name, gf.path))
-                continue
-            i = 0
-            while score.value > ranges[i].max:
-                i += 1
-            copyfile(gf.path, os.path.join(range_map[ranges[i].max], gf.name))
-            gfc += 1
-            range_count[ranges[i].max] += 1
-            if score.stack.value >= 0:
-                range_stack[ranges[i].max].append(score.stack)
-                range_eliminates[ranges[i].max].extend(score.eliminates)
-                range_wins[ranges[i].max].append(score.win)
-            else:
-                logging.warning("Cannot get stack from file={}, full path={}".format(gf.name, gf.path))
-
-            if gf.id in stats:
-                copyfile(stats[gf.id].path, os.path.join(range_map[ranges[i].max], stats[gf.id].name))
-                sfc += 1
+        parse_file = partial(FileStructure.__parse_file__, players=players, stack=stack)
+        range_maxes = [r.max for r in ranges]
+        copies = []
+        with ProcessPoolExecutor() as pool, ThreadPoolExecutor(max_workers=COPY_WORKERS) as copy_pool:
+            scores = pool.map(parse_file, self.game_files, chunksize=32)
+            for gf, score in zip(self.game_files, scores):
+                if score.value == -2:
+                    logging.warning("Cannot get bounties from file={}, full path={}".format(gf.name, gf.path))
+                    continue
+                if score.value < 0:
+                    continue
+                if score.value > MAX_SCORE:
+                    logging.warning("Score={} is too high file={}, full path={}".format(score.value, gf.name, gf.path))
+                    continue
+                i = bisect_left(range_maxes, score.value)
+                game_path = os.path.join(range_map[ranges[i].max], gf.name)
+                copies.append(copy_pool.submit(FileStructure.__copy_file__, gf.path, game_path, hardlink))
+                gfc += 1
+                range_count[ranges[i].max] += 1
+                if score.stack.value >= 0:
+                    range_stack_values[ranges[i].max].append(score.stack.value)
+                    range_stack_chips[ranges[i].max].append(score.stack.chips)
+                    for el in score.eliminates:
+                        range_multipliers[ranges[i].max].update(el.multipliers)
+                        range_values[ranges[i].max].extend(el.values)
+                        range_possibles[ranges[i].max].extend(el.possibles)
+                    range_eliminates[ranges[i].max] += len(score.eliminates)
+                    range_games[ranges[i].max] += 1
+                    range_wins[ranges[i].max] += score.win
+                else:
+                    logging.warning("Cannot get stack from file={}, full path={}".format(gf.name, gf.path))
+
+                if gf.id in stats:
+                    stat_path = os.path.join(range_map[ranges[i].max], stats[gf.id].name)
+                    copies.append(copy_pool.submit(FileStructure.__copy_file__, stats[gf.id].path, stat_path, hardlink))
+                    sfc += 1
+            for copy in copies:
+                copy.result()
+
+        with open(range_map[INFO_FILE], "w", buffering=BUFFER_SIZE) as handler:
+            for r in ranges:
+                handler.write("Range {:5}\n".format(r.max))
+
+                stack_values = range_stack_values[r.max]
+                stack_chips = range_stack_chips[r.max]
+                if stack_values:
+                    handler.write(
+                        "  Stack avg: {:0.3f}\n"
+                        "  Stack med: {:0.3f}\n"
+                        "  Stack chips avg: {:0.3f}\n"
+                        "  Stack chips med: {:0.3f}\n".format(mean(stack_values), median(stack_values),
+                                                              mean(stack_chips), median(stack_chips))
+                    )
 
-        info_lines = []
-        for r in ranges:
-            info_lines.append("Range {:5}\n".format(r.max))
-
-            stacks = range_stack[r.max]
-            if stacks:
-                stack_values = list(map(lambda s: s.value, stacks))
-                stack_chips = list(map(lambda s: s.chips, stacks))
-                info_lines.append("  Stack avg: {:0.3f}\n".format(mean(stack_values)))
-                info_lines.append("  Stack med: {:0.3f}\n".format(median(stack_values)))
-                info_lines.append("  Stack chips avg: {:0.3f}\n".format(mean(stack_chips)))
-                info_lines.append("  Stack chips med: {:0.3f}\n".format(median(stack_chips)))
-
-            rel = range_eliminates[r.max]
-            wins = range_wins[r.max]
-            if rel:
-                eliminates = defaultdict(list)
-                for el in rel:
-                    for m in el.multipliers:
-                        eliminates[m].append(el)
-                eliminate_keys = sorted(eliminates.keys())
-                info_lines.append("  Eliminates:\n")
-                for el_key in eliminate_keys:
-                    els = eliminates[el_key]
-                    info_lines.append(
-                        "    {}: {:0.2f}%   ({}/{})\n".format(el_key / 10, len(els) / len(rel) * 100, len(els),
-                                                              len(rel))
+                rel = range_eliminates[r.max]
+                games = range_games[r.max]
+                if rel:
+                    eliminates = range_multipliers[r.max]
+                    rel_values = range_values[r.max]
+                    rel_possibles = range_possibles[r.max]
+                    handler.write("  Eliminates:\n")
+                    for el_key in sorted(eliminates):
+                        el_count = eliminates[el_key]
+                        handler.write(
+                            "    {}: {:0.2f}%   ({}/{})\n".format(el_key / 10, el_count / rel * 100, el_count, rel)
+                        )
+                    win_count = range_wins[r.max]
+                    srv = sum(rel_values)
+                    srp = sum(rel_possibles)
+                    handler.write(
+                        "  Eliminates avg: {:0.3f}   ({}/{})\n"
+                        "  Lost bounties: {:0.2f}%   ({:0.2f}/{:0.2f})\n"
+                        "  Win bounty avg: {:0.3f}\n"
+                        "  Win bounty med: {:0.3f}\n"
+                        "  Win rate: {:0.2f}%   ({}/{})\n".format(rel / games * 100, rel, games,
+                                                                  srv / srp * 100, srv, srp,
+                                                                  mean(rel_values), median(rel_values),
+                                                                  win_count / games * 100, win_count, games)
                     )
-                rel_values = []
-                rel_possibles = []
-                for el in rel:
-                    rel_values.extend(el.values)
-                    rel_possibles.extend(el.possibles)
-                win_count = len(list(filter(lambda w: w, wins)))
-                srv = sum(rel_values)
-                srp = sum(rel_possibles)
-                info_lines.append(
-                    "  Eliminates avg: {:0.3f}   ({}/{})\n".format(len(rel) / len(wins) * 100, len(rel), len(wins))
-                )
-                info_lines.append("  Lost bounties: {:0.2f}%   ({:0.2f}/{:0.2f})\n".format(srv / srp * 100, srv, srp))
-                info_lines.append("  Win bounty avg: {:0.3f}\n".format(mean(rel_values)))
-                info_lines.append("  Win bounty med: {:0.3f}\n".format(median(rel_values)))
-                info_lines.append(
-                    "  Win rate: {:0.2f}%   ({}/{})\n".format(win_count / len(wins) * 100, win_count, len(wins))
-                )
-            info_lines.append("\n\n")
-        with open(range_map[INFO_FILE], "w") as handler:
-            handler.writelines(info_lines)
+                handler.write("\n\n")
 
         logging.info("Done splitting")
         logging.info("")
@@ -131,145 +182,162 @@ class FileStructure:
         logging.info("Stat files handled = {}".format(sfc))
         logging.info("No stat files      = {}".format(gfc - sfc))
 
-    def __parse_file__(self, gf, players, stack):
-        seats = self.__get_seats__(gf)
+    @staticmethod
+    def __copy_file__(src, dst, hardlink):
+        if hardlink:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        copyfile(src, dst)
+
+    @staticmethod
+    def __parse_file__(gf, players, stack):
+        with open(gf.path, "rb") as handler:
+            if os.fstat(handler.fileno()).st_size == 0:
+                return FileStructure.__parse_data__(gf, b"", players, stack)
+            with mmap.mmap(handler.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return FileStructure.__parse_data__(gf, data, players, stack)
+
+    @staticmethod
+    def __parse_data__(gf, data, players, stack):
+        seats = FileStructure.__get_seats__(gf, data)
         if not seats:
             return Score(-1, -1, [], False)
-        bounties = list(map(self.__get_bounty__, seats))
+        seats = [FileStructure.__parse_seat__(seat) for seat in seats]
+        bounties = [seat.bounty if seat else -1 for seat in seats]
         bounties_avg = mean(bounties)
-        if any(map(lambda e: e < 0, bounties)):
+        if any(bounty < 0 for bounty in bounties):
             return Score(-2, -1, [], False)
-        player_stack = self.__get_player_stack__(seats, players)
+        player_stack = FileStructure.__get_player_stack__(seats, players)
+        if player_stack.value < 0:
+            return Score(bounties_avg, player_stack, [], False)
 
         div = 5 if round(bounties_avg, 2) > stack else 4
-        hand_stats = self.__parse_hand_stat__(gf, players, div)
-        eliminates = list(map(lambda h: h.eliminate, hand_stats))
-        win = any(map(lambda h: h.win, hand_stats))
+        hand_stats = FileStructure.__parse_hand_stat__(gf, data, players, div)
+        eliminates = [h.eliminate for h in hand_stats]
+        win = any(h.win for h in hand_stats)
 
         return Score(bounties_avg, player_stack, eliminates, win)
 
     @staticmethod
-    def __get_seats__(gf):
+    def __get_seats__(gf, data):
         result = []
-        with open(gf.path, encoding="utf8") as handler:
-            line = handler.readline()
-            while line and "Seat #1" not in line:
-                line = handler.readline()
-            if not line:
-                logging.warning("File has no 'Seat #1', file={}, full path={}".format(gf.name, gf.path))
-                return []
-            line = handler.readline()
-            while line and "Seat" in line:
-                result.append(line)
-                line = handler.readline()
-            if len(result) != 4:
-                logging.warning("File has {} seats, file={}, full path={}".format(len(result), gf.name, gf.path))
-                return []
+        start = data.find(b"Seat #1")
+        if start < 0:
+            logging.warning("File has no 'Seat #1', file={}, full path={}".format(gf.name, gf.path))
+            return []
+        start = data.find(b"\n", start) + 1
+        while 0 < start < len(data):
+            end = data.find(b"\n", start)
+            end = len(data) if end < 0 else end
+            line = data[start:end]
+            if b"Seat" not in line:
+                break
+            result.append(line)
+            start = end + 1
+        if len(result) != 4:
+            logging.warning("File has {} seats, file={}, full path={}".format(len(result), gf.name, gf.path))
+            return []
 
         return result
 
-    def __parse_hand_stat__(self, gf, players, div):
+    @staticmethod
+    def __parse_hand_stat__(gf, data, players, div):
         result = []
-        hand_lines = []
-        with open(gf.path, encoding="utf8") as handler:
-            line = handler.readline()
-            while line:
-                line = line.strip()
-                if line:
-                    hand_lines.append(line)
-                elif hand_lines:
-                    result.append(self.__get_hand_stat__(hand_lines, players, div))
-                    hand_lines.clear()
-                line = handler.readline()
-        if hand_lines:
-            result.append(self.__get_hand_stat__(hand_lines, players, div))
-
-        result = list(filter(lambda el: el, result))
-        if any(map(lambda h: not h.eliminate.values, result)):
+        weird = False
+        for block in HAND_SEPARATOR.split(data):
+            if block.find(b"eliminating") < 0:
+                continue
+            hand_tokens = [tokens for tokens in map(bytes.split, block.split(b"\n")) if tokens]
+            finished = block.find(b"wins the tournament") >= 0
+            hand_stat = FileStructure.__get_hand_stat__(hand_tokens, players, div, finished)
+            if not hand_stat:
+                continue
+            if hand_stat.eliminate.values:
+                result.append(hand_stat)
+            else:
+                weird = True
+
+        if weird:
             logging.warning("File has weird eliminates, file={}, full path={}".format(gf.name, gf.path))
-        return list(filter(lambda h: h.eliminate.values, result))
-
-    def __get_hand_stat__(self, hand_lines, players, div):
-        eliminate_lines = []
-        for line in hand_lines:
-            if "eliminating" in line:
-                line_split = line.split()
-                if line_split[0] in players:
-                    eliminate_lines.append(line_split)
-                    break
-        if not eliminate_lines:
-            return None
+        return result
 
+    @staticmethod
+    def __get_hand_stat__(hand_tokens, players, div, finished):
         bounties = {}
-        try:
-            for line in filter(lambda s: s.startswith("Seat"), hand_lines[:10]):
-                player = line.strip().split()[2]
-                bounty = self.__get_bounty__(line)
-                bounties[player] = bounty
-
-            win_bounties = []
-            possible_bounties = []
-            multipliers = []
-            for eliminate_line in eliminate_lines:
-                i = eliminate_line.index("wins")
-                win_bounty = float(self.__get_num__(eliminate_line[i + 1]))
-                j = eliminate_line.index("eliminating")
-                bounty = bounties[eliminate_line[j + 1]]
-                win_bounties.append(win_bounty)
-                possible_bounties.append(bounty * 2 / div)
-                multipliers.append(round(win_bounty / (bounty / div) * 10))
-
-            win = False
-            for line in reversed(hand_lines):
-                if "wins the tournament" in line and line.split()[0] in players:
+        eliminate_line = None
+        win = False
+        for k, tokens in enumerate(hand_tokens):
+            if k < 10 and tokens[0] == b"Seat":
+                seat = FileStructure.__parse_seat__(b" ".join(tokens))
+                if seat:
+                    bounties[seat.player] = seat.bounty
+            elif tokens[0] in players:
+                if eliminate_line is None and b"eliminating" in tokens:
+                    eliminate_line = tokens
+                if finished and not win and b"wins the tournament" in b" ".join(tokens):
                     win = True
+        if eliminate_line is None:
+            return None
 
-            return HandStat(Eliminate(multipliers, win_bounties, possible_bounties), win)
+        try:
+            i = eliminate_line.index(b"wins")
+            win_bounty = float(FileStructure.__get_num__(eliminate_line[i + 1]))
+            j = eliminate_line.index(b"eliminating")
+            share = bounties[eliminate_line[j + 1]] / div
+            eliminate = Eliminate([round(win_bounty / share * 10)], [win_bounty], [share * 2])
+            return HandStat(eliminate, win)
         except (ValueError, IndexError, KeyError):
             return HandStat(Eliminate([], [], []), False)
 
-    def __get_bounty__(self, seat):
+    @staticmethod
+    def __parse_seat__(line):
+        match = SEAT_PATTERN.search(line)
+        if not match:
+            return None
+        player, chips, bounty = match.groups()
         try:
-            parts = seat.strip().split()
-            for i, part in enumerate(parts):
-                if "bounty" in part and part.endswith(")") and "chip" in parts[i - 2]:
-                    return float(self.__get_num__(parts[i - 1]))
-            return -1
-        except (ValueError, IndexError):
-            return -1
+            return Seat(player.split()[0], int(chips), float(bounty))
+        except ValueError:
+            return None
 
     @staticmethod
     def __get_num__(s):
         i = 0
-        while i < len(s) and not s[i].isdigit():
+        while i < len(s) and not s[i:i + 1].isdigit():
             i += 1
         return s[i:]
 
-    def __get_player_stack__(self, seats, players):
+    @staticmethod
+    def __get_player_stack__(seats, players):
         for seat in seats:
-            try:
-                parts = seat.split()
-                if parts[2] in players:
-                    bounty = self.__get_bounty__(seat)
-                    i = parts.index("chips,")
-                    chips = int(parts[i - 2][1:])
-                    return Stack(bounty, chips)
-            except (ValueError, IndexError):
-                return Stack(-1, -1)
+            if seat.player in players:
+                return Stack(seat.bounty, seat.chips)
         return Stack(-1, -1)
 
     def __collect_files__(self, path):
-        for root, _, files in os.walk(path):
-            for file in files:
-                path = os.path.join(root, file)
-                if file.startswith("TS"):
-                    fid = self.__get_file_id__(file, path)
-                    self.stat_files.append(File(file, fid, path))
-                    continue
-                if file.startswith("HH") and "Varied" in file:
-                    fid = self.__get_file_id__(file, path)
-                    self.game_files.append(File(file, fid, path))
-                    continue
+        folders = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            folders.append(entry.path)
+                        continue
+                    file = entry.name
+                    prefix = file[:2]
+                    if prefix == "TS":
+                        fid = self.__get_file_id__(file, entry.path)
+                        self.stat_files.append(File(file, fid, entry.path))
+                    elif prefix == "HH" and "Varied" in file:
+                        fid = self.__get_file_id__(file, entry.path)
+                        self.game_files.append(File(file, fid, entry.path))
+        except OSError:
+            return
+        for folder in folders:
+            self.__collect_files__(folder)
 
     def __apply_mode__(self, mode):
         if mode:
@@ -306,13 +374,22 @@ class FileStructure:
         return range_map
 
 
+def mean(values):
+    return fsum(values) / len(values)
+
+
+def median(values):
+    values = sorted(values)
+    i = len(values) // 2
+    return values[i] if len(values) % 2 else (values[i - 1] + values[i]) / 2
+
+
 def parse_file_args(file):
     result = {}
     if os.path.exists(file):
         with open(file, encoding="utf8") as handler:
-            config = handler.readlines()
-        for k, v in map(lambda s: s.split("=", 1), config):
-            result[k.strip()] = v.strip()
+            config = handler.read().splitlines()
+        result = {k.strip(): v.strip() for k, sep, v in (line.partition("=") for line in config) if sep}
 
     return result
 
@@ -327,7 +404,7 @@ def parse_intervals(intervals):
 
 
 def parse_player_names(names):
-    return set(map(lambda name: name.strip().split()[0], names.split(",")))
+    return frozenset(map(lambda name: name.strip().split()[0].encode("utf8"), names.split(",")))
 
 
 def get_demo_key(s):
@@ -346,6 +423,7 @@ def parse_args(config_file="config.txt"):
     parser.add_argument("-d", "--demo", metavar="demo", help="turn off demo mode")
     parser.add_argument("-n", "--names", metavar="names", help="player names to calculate stat")
     parser.add_argument("-s", "--stack", metavar="stack", help="average stack to calculate stat")
+    parser.add_argument("-l", "--hardlink", action="store_true", help="hard link files instead of copying them")
     args = parser.parse_args()
     config_args = parse_file_args(config_file)
 
@@ -368,13 +446,15 @@ def parse_args(config_file="config.txt"):
         args.stack = config_args.get("stack", "10.8")
     args.avg_stack = float(args.stack)
     args.mode = get_demo_key(args.demo) != "lkNFenco"
+    if not args.hardlink:
+        args.hardlink = config_args.get("hardlink", "").lower() == "true"
 
     return args
 
 
-def split(path, result_folder, ranges, players, stack, mode):
+def split(path, result_folder, ranges, players, stack, mode, hardlink):
     fs = FileStructure(path, mode)
-    fs.split(result_folder, ranges, players, stack)
+    fs.split(result_folder, ranges, players, stack, hardlink)
 
 
 def main():
@@ -382,11 +462,12 @@ def main():
     logging.info("Input folder: {}".format(args.path))
     logging.info("Result folder: {}".format(args.result))
     logging.info("Ranges: {}".format(args.ranges))
-    logging.info("Player names: {}".format(args.players))
+    logging.info("Player names: {}".format(set(map(lambda name: name.decode("utf8"), args.players))))
     logging.info("Avg stack: {}".format(args.avg_stack))
     logging.info("Demo mode: {}".format(args.mode))
+    logging.info("Hard links: {}".format(args.hardlink))
     logging.info("")
-    split(args.path, args.result, args.ranges, args.players, args.avg_stack, args.mode)
+    split(args.path, args.result, args.ranges, args.players, args.avg_stack, args.mode, args.hardlink)
 
     return 0
 
@@ -0,0 +1,59 @@
+import unittest
+
+from ranges import Eliminate, File, FileStructure, Score, Seat, Stack, parse_player_names
+
+GAME_FILE = File("HH20240101 1 Mystery.txt", 1, "HH20240101 1 Mystery.txt")
+
+
+def game_data(currency, winner_line, hero="Hero"):
+    return "\n".join([
+        "Poker Hand #HD1: Tournament #1, Mystery {}10 Hold'em No Limit".format(currency),
+        "Table '1' 4-max Seat #1 is the button",
+        "Seat 1: Big Bob (500 in chips, {}2.5 bounty)".format(currency),
+        "Seat 2: {} (500 in chips, {}2.5 bounty)".format(hero, currency),
+        "Seat 3: Dan the Man (500 in chips, {}2.5 bounty)".format(currency),
+        "Seat 4: Eve (500 in chips, {}2.5 bounty)".format(currency),
+        "{} wins {}1.25 for eliminating Big Bob and their own bounty increases".format(hero, currency),
+        winner_line,
+        "*** SUMMARY ***",
+        ""
+    ]).encode("utf8")
+
+
+class SeatTest(unittest.TestCase):
+
+    def test_nickname_with_space(self):
+        self.assertEqual(
+            FileStructure.__parse_seat__(b"Seat 3: Dan the Man (500 in chips, $7.5 bounty)"),
+            Seat(b"Dan", 500, 7.5)
+        )
+
+    def test_non_dollar_currency(self):
+        self.assertEqual(
+            FileStructure.__parse_seat__("Seat 2: Hero (500 in chips, €2.50 bounty)".encode("utf8")),
+            Seat(b"Hero", 500, 2.5)
+        )
+
+    def test_no_currency(self):
+        self.assertEqual(
+            FileStructure.__parse_seat__(b"Seat 2: Hero (800 in chips, 5 bounty)"),
+            Seat(b"Hero", 800, 5.0)
+        )
+
+    def test_game_with_spaced_nicknames_and_euro(self):
+        data = game_data("€", "Hero wins the tournament")
+        self.assertEqual(
+            FileStructure.__parse_data__(GAME_FILE, data, parse_player_names("Hero"), 10.8),
+            Score(2.5, Stack(2.5, 500), [Eliminate([20], [1.25], [1.25])], True)
+        )
+
+    def test_win_with_spaced_hero_nickname(self):
+        data = game_data("$", "Hero x wins the tournament", "Hero x")
+        self.assertEqual(
+            FileStructure.__parse_data__(GAME_FILE, data, parse_player_names("Hero x"), 10.8),
+            Score(2.5, Stack(2.5, 500), [Eliminate([20], [1.25], [1.25])], True)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
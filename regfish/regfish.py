@@ -3,9 +3,16 @@ import argparse
 import json
 import logging
 import os
+import pickle
+import re
+import sys
+from array import array
 from collections import defaultdict, Counter, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import timezone, datetime, timedelta
 from enum import Enum
+from functools import lru_cache, partial
 from shutil import copyfile
 from types import SimpleNamespace
 from typing import NamedTuple
@@ -14,6 +21,8 @@ FORMAT = "%(asctime)-15s [%(levelname)8s] %(message)s"
 logging.basicConfig(format=FORMAT, level=logging.INFO)
 
 INDEX_FILE_NAME = "index.txt"
+INDEX_CACHE_FILE_NAME = "index.pkl"
+INDEX_CACHE_VERSION = 1
 PLAYER_FILE_NAME = "players.txt"
 STAT_FILE_NAME = "stats.txt"
 
@@ -21,7 +30,19 @@ EXPRESSO_NITRO = "Expresso Nitro"
 LIMIT_SUMMARY = "limit_summary"
 WNX_CM = "WNX.cm"
 DATETIME_FORMAT = "%Y/%m/%d %H:%M:%S"
+TS_DATA_PREFIXES = {b"B": b"Buy-In", b"P": b"Prizepool", b"T": b"Tournament started", b"Y": b"You won"}
 REF_FISH_FOLDER_FORMAT = "reg-{}-fish-{}"
+COPY_WORKERS = 32
+WALK_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+WALK_DEPTH = 2
+FOLDER_DATE_MARGIN_DAYS = 1
+FOLDER_YEARS = range(1990, 2100)
+FOLDER_DATE_LIMITS = (12, 31)
+READ_BUFFER_SIZE = 1 << 20
+WRITE_BUFFER_SIZE = 1 << 20
+REPORT_SLOT_CACHE_SIZE = 1 << 16
+TABLE_ID_PATTERN = re.compile(r"\(([^()]*)")
+DATA_LINE_PATTERN = re.compile(r"(?:^|\s)buyIn:\s+(\S+)\s+\S+\s+(\S+)\s.*\s(\S+)\s+(\S+)\s+\S+\s*$")
 
 WEEKDAY = "Weekday"
 WEEKEND = "Weekend"
@@ -43,21 +64,18 @@ class CalcMode(Enum):
 class TableFileMeta(NamedTuple):
     id: int
     tsdata_file: str
-    data_files: set[str]
+    data_files: list[str]
 
 
-class TableData(NamedTuple):
+@dataclass(slots=True, frozen=True)
+class TableData:
     timestamp: str
     prize_pool: float
     buy_in: float
 
 
-class Player(NamedTuple):
-    nickname: str
-    hands: int
-
-
-class XA(NamedTuple):
+@dataclass(slots=True, frozen=True)
+class XA:
     nickname: str
     after_hand: int
 
@@ -65,12 +83,19 @@ class XA(NamedTuple):
 NO_XA = XA("", -1)
 
 
+class HandState(Enum):
+    PRE = "pre"
+    SEATS = "seats"
+    POST = "post"
+
+
 class XAType(Enum):
     FISH = "fish"
     LOST = "lost"
 
 
-class IndexedPlayer(NamedTuple):
+@dataclass(slots=True, frozen=True)
+class IndexedPlayer:
     nickname: str
     tables: int
     hands: int
@@ -84,18 +109,21 @@ class PlayerType(Enum):
 class TableFast(NamedTuple):
     id: int
     table_data: TableData
-    players: list[Player]
+    player_nicknames: tuple[str, ...]
 
 
-class Table(NamedTuple):
+@dataclass(slots=True, frozen=True)
+class Table:
     id: int
     table_data: TableData
-    players: list[Player]
+    player_nicknames: tuple[str, ...]
+    player_hands: array
     xa: XA
     lost_after_hand: int
 
 
-class TableStat(NamedTuple):
+@dataclass(slots=True, frozen=True)
+class TableStat:
     file_meta: TableFileMeta
     is_x2: bool
     xa_after_hand: int
@@ -119,6 +147,7 @@ class IndexCreator:
         self.path_result = result
         self.self_nicknames = nicknames
         self.index_file = os.path.join(result, INDEX_FILE_NAME)
+        self.index_cache_file = os.path.join(result, INDEX_CACHE_FILE_NAME)
         self.player_file = os.path.join(result, PLAYER_FILE_NAME)
 
     def index(self):
@@ -131,23 +160,18 @@ class IndexCreator:
 
     def __get_files_to_index__(self):
         logging.info("Start getting files to index")
-        data_file_idx = defaultdict(set)
+        data_file_idx = defaultdict(list)
         tsdata_file_idx = {}
-        count = 0
-        for root, _, files in os.walk(self.path_data):
-            for file in filter(is_data_file, files):
-                table_id = parse_table_id(file)
-                data_file_idx[table_id].add(os.path.join(root, file))
-                count += 1
-        logging.info("Data files to index: {} ".format(count))
+        data_files, tsdata_files = list_data_and_tsdata_files(self.path_data, self.path_tsdata)
+        for file, path in data_files:
+            table_id = parse_table_id(file)
+            data_file_idx[table_id].append(path)
+        logging.info("Data files to index: {} ".format(len(data_files)))
 
-        count = 0
-        for root, _, files in os.walk(self.path_tsdata):
-            for file in filter(is_tsdata_file, files):
-                table_id = parse_table_id(file)
-                tsdata_file_idx[table_id] = os.path.join(root, file)
-                count += 1
-        logging.info("TS data files to index: {} ".format(count))
+        for file, path in tsdata_files:
+            table_id = parse_table_id(file)
+            tsdata_file_idx[table_id] = path
+        logging.info("TS data files to index: {} ".format(len(tsdata_files)))
 
         result = []
         for table_id, tsdata_file in tsdata_file_idx.items():
@@ -165,110 +189,139 @@ class IndexCreator:
         logging.info("Start getting tables from {} files".format(len(files_to_index)))
         tables = []
         mod = statistic_mod(len(files_to_index))
-        for i, file_to_index in enumerate(files_to_index):
-            if i % mod == 0:
-                logging.info("Getting table from {}/{} files...".format(i, len(files_to_index)))
-            table_data, won = IndexCreator.__get_table_data__(file_to_index.tsdata_file)
-            if not table_data:
-                logging.warning("Cannot get table data from TS file. Skipping: {}".format(file_to_index.tsdata_file))
-                continue
-            players, xa, hand_count = self.__get_data__(file_to_index.data_files)
-            lost_after_hand = 0 if won else hand_count
-            tables.append(Table(file_to_index.id, table_data, players, xa, lost_after_hand))
+        get_table = partial(IndexCreator.__get_table__, self_nicknames=frozenset(self.self_nicknames))
+        with ProcessPoolExecutor() as executor:
+            results = executor.map(get_table, files_to_index, chunksize=64)
+            for i, (file_to_index, table) in enumerate(zip(files_to_index, results)):
+                if i % mod == 0:
+                    logging.info("Getting table from {}/{} files...".format(i, len(files_to_index)))
+                if not table:
+                    tsdata_file = file_to_index.tsdata_file
+                    logging.warning("Cannot get table data from TS file. Skipping: {}".format(tsdata_file))
+                    continue
+                tables.append(table)
 
         logging.info("Got {} tables from files".format(len(tables)))
 
         return tables
 
+    @staticmethod
+    def __get_table__(file_to_index, self_nicknames):
+        table_data, won = IndexCreator.__get_table_data__(file_to_index.tsdata_file)
+        if not table_data:
+            return None
+        player_nicknames, player_hands, xa, hand_count = IndexCreator.__get_data__(
+            file_to_index.data_files, self_nicknames
+        )
+        lost_after_hand = 0 if won else hand_count
+        return Table(file_to_index.id, table_data, player_nicknames, player_hands, xa, lost_after_hand)
+
     @staticmethod
     def __get_indexed_players__(tables):
         logging.info("Start getting indexed players")
-        indexed_players = {}
-        player_tables = Counter()
-        player_hands = Counter()
+        players = {}
         for table in tables:
-            for player in table.players:
-                player_tables[player.nickname] += 1
-                player_hands[player.nickname] += player.hands
-        for nickname, table_count in player_tables.items():
-            indexed_player = IndexedPlayer(nickname, table_count, player_hands[nickname])
-            indexed_players[nickname] = indexed_player
+            for nickname, hands in zip(table.player_nicknames, table.player_hands):
+                counts = players.get(nickname)
+                if counts is None:
+                    players[nickname] = [1, hands]
+                else:
+                    counts[0] += 1
+                    counts[1] += hands
+        indexed_players = [
+            IndexedPlayer(nickname, table_count, hand_count) for nickname, (table_count, hand_count) in players.items()
+        ]
 
         logging.info("Got {} indexed players".format(len(indexed_players)))
 
-        return list(indexed_players.values())
+        return indexed_players
 
     @staticmethod
     def __get_table_data__(tsdata_file):
-        with open(tsdata_file, encoding="utf-8") as handler:
-            lines = handler.readlines()
         buy_in, prize_pool, timestamp, won = None, None, None, False
-        for line in lines:
-            if line.startswith("Buy-In"):
-                buy_in = parse_buy_in(line)
-            elif line.startswith("Prizepool"):
-                prize_pool = parse_prize_pool(line)
-            elif line.startswith("Tournament started"):
-                timestamp = parse_tournament_started(line)
-            elif line.startswith("You won"):
-                won = True
+        with open(tsdata_file, "rb", buffering=READ_BUFFER_SIZE) as handler:
+            for line in handler:
+                key = line[:1]
+                prefix = TS_DATA_PREFIXES.get(key)
+                if prefix is None or not line.startswith(prefix):
+                    continue
+                if key == b"B":
+                    buy_in = parse_buy_in(line.decode("utf-8"))
+                elif key == b"P":
+                    prize_pool = parse_prize_pool(line.decode("utf-8"))
+                elif key == b"T":
+                    timestamp = parse_tournament_started(line.decode("utf-8"))
+                else:
+                    won = True
+                if won and buy_in is not None and prize_pool is not None and timestamp is not None:
+                    break
 
         if buy_in is None or prize_pool is None or timestamp is None:
             return None, won
 
         return TableData(timestamp, prize_pool, buy_in), won
 
-    def __get_data__(self, data_files):
+    @staticmethod
+    def __get_data__(data_files, self_nicknames):
         xa = None
         counter = Counter()
-        lines = []
-        for data_file in sorted_data_files(data_files):
-            with open(data_file, encoding="utf-8") as handler:
-                lines.extend(handler.readlines())
-
-        i = 0
         hand_count = 0
-        while i < len(lines):
-            while i < len(lines) and not bool(lines[i].strip()):
-                i += 1
-            while i < len(lines) and not lines[i].startswith("Seat"):
-                i += 1
-            xa_nicknames = set()
-            while i < len(lines) and lines[i].startswith("Seat"):
-                nickname = parse_nickname(lines[i])
-                if nickname not in self.self_nicknames:
-                    counter[nickname] += 1
-                xa_nicknames.add(nickname)
-                i += 1
-            xa_inter = xa_nicknames.intersection(self.self_nicknames)
-            if xa is None and len(xa_inter) == 1 and len(xa_nicknames) == 2:
-                nickname = next(iter(xa_nicknames.difference(xa_inter)))
-                xa = XA(nickname, hand_count)
-            while i < len(lines) and bool(lines[i].strip()):
-                i += 1
+        xa_nicknames = set()
+        state = HandState.PRE
+        line = None
+        for data_file in sorted_data_files(data_files):
+            with open(data_file, "rb", buffering=READ_BUFFER_SIZE) as handler:
+                for line in handler:
+                    if state == HandState.PRE:
+                        if line[:4] != b"Seat":
+                            continue
+                        state = HandState.SEATS
+                        if xa is None:
+                            xa_nicknames = set()
+                    if state == HandState.SEATS:
+                        if line[:4] == b"Seat":
+                            nickname = parse_nickname(line.decode("utf-8"))
+                            if nickname not in self_nicknames:
+                                counter[nickname] += 1
+                            if xa is None:
+                                xa_nicknames.add(nickname)
+                            continue
+                        if xa is None:
+                            xa = IndexCreator.__get_xa__(xa_nicknames, self_nicknames, hand_count)
+                        state = HandState.POST
+                    if not line.strip():
+                        hand_count += 1
+                        state = HandState.PRE
+        if line is not None:
+            if state == HandState.SEATS and xa is None:
+                xa = IndexCreator.__get_xa__(xa_nicknames, self_nicknames, hand_count)
             hand_count += 1
 
-        players = [Player(nickname, count) for nickname, count in counter.items()]
+        return tuple(counter.keys()), array("q", counter.values()), xa if xa else NO_XA, hand_count
 
-        return players, xa if xa else NO_XA, hand_count
+    @staticmethod
+    def __get_xa__(xa_nicknames, self_nicknames, hand_count):
+        xa_inter = xa_nicknames.intersection(self_nicknames)
+        if len(xa_inter) == 1 and len(xa_nicknames) == 2:
+            nickname = next(iter(xa_nicknames.difference(xa_inter)))
+            return XA(nickname, hand_count)
+        return None
 
     def __write_index__(self, tables, indexed_players):
         logging.info("Saving {} tables into index file...".format(len(tables)))
-        serialized_tables = map(serialize_table, tables)
         mod = statistic_mod(len(tables))
-        with open(self.index_file, "w", encoding="utf-8") as handler:
-            for i, serialized_table in enumerate(serialized_tables):
-                if i % mod == 0:
-                    logging.info("Adding {}/{} table into index file...".format(i, len(tables)))
-                handler.write(serialized_table)
-                handler.write("\n")
+        with open(self.index_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as handler:
+            for i in range(0, len(tables), mod):
+                logging.info("Adding {}/{} table into index file...".format(i, len(tables)))
+                handler.write("".join(serialize_table(table) + "\n" for table in tables[i:i + mod]))
+        with open(self.index_cache_file, "wb") as handler:
+            records = [table_to_record(table) for table in tables]
+            pickle.dump((INDEX_CACHE_VERSION, records), handler, protocol=pickle.HIGHEST_PROTOCOL)
         logging.info("Saved tables into index file")
 
         logging.info("Saving {} indexed players into players file...".format(len(indexed_players)))
-        with open(self.player_file, "w", encoding="utf-8") as handler:
-            for indexed_player in indexed_players:
-                handler.write(serialize_indexed_player(indexed_player))
-                handler.write("\n")
+        with open(self.player_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as handler:
+            handler.write("".join(serialize_indexed_player(player) + "\n" for player in indexed_players))
         logging.info("Saved indexed players into players file")
 
 
@@ -282,22 +335,50 @@ class AbstractStatisticCalculator(abc.ABC):
         self.original_interval = original_interval
         self.current_interval = current_interval
         self.index_file = os.path.join(result, INDEX_FILE_NAME)
+        self.index_cache_file = os.path.join(result, INDEX_CACHE_FILE_NAME)
         self.player_file = os.path.join(result, PLAYER_FILE_NAME)
+        self.local_tz = datetime.now().astimezone().tzinfo
         self.index = self.__get_index__()
         self.players = self.__get_players__()
 
     def __get_index__(self):
         logging.info("Loading index...")
-        tables = {}
-        with open(self.index_file, encoding="utf-8") as handler:
-            for line in handler:
-                table = deserialize_table(line)
-                tables[table.id] = table
+        tables = self.__get_index_cache__()
+        if tables is None:
+            tables = {}
+            with open(self.index_file, encoding="utf-8") as handler:
+                for line in handler:
+                    table = deserialize_table(line)
+                    tables[table.id] = table
 
         logging.info("Loaded index with {} tables".format(len(tables)))
 
         return tables
 
+    def __get_index_cache__(self):
+        try:
+            if os.path.getmtime(self.index_cache_file) < os.path.getmtime(self.index_file):
+                return None
+            with open(self.index_cache_file, "rb") as handler:
+                cache = pickle.load(handler)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            version, records = cache
+            if version != INDEX_CACHE_VERSION:
+                raise ValueError("unknown cache version")
+            tables = {}
+            for record in records:
+                table = record_to_table(record)
+                tables[table.id] = table
+        except (ValueError, TypeError) as e:
+            logging.warning(
+                "Cannot use index cache {}: {}. Loading {}".format(self.index_cache_file, e, self.index_file)
+            )
+            return None
+
+        return tables
+
     def __get_players__(self):
         logging.info("Loading players...")
         players = {}
@@ -311,20 +392,18 @@ class AbstractStatisticCalculator(abc.ABC):
         return players
 
     @abc.abstractmethod
-    def __get_calc_files__(self):
+    def __get_calc_files__(self, interval):
         pass
 
     def __get_colored_players__(self):
         logging.info("Start getting colored players")
         colored_players = {}
-        for root, _, files in os.walk(self.path_colormarkers):
-            for file in filter(is_color_marker_file, files):
-                filename = os.path.join(root, file)
-                with open(filename, encoding="utf-8") as handler:
-                    text = "".join(handler.readlines())
-                    player = json.loads(text, object_hook=lambda d: SimpleNamespace(**d))
-                    player_type = PlayerType.REG if player.ColorMarker.IsReg else PlayerType.FISH
-                    colored_players[player.Player.Nickname] = player_type
+        for _, filename in iter_files(self.path_colormarkers, is_color_marker_file):
+            with open(filename, encoding="utf-8") as handler:
+                text = "".join(handler.readlines())
+                player = json.loads(text, object_hook=lambda d: SimpleNamespace(**d))
+                player_type = PlayerType.REG if player.ColorMarker.IsReg else PlayerType.FISH
+                colored_players[player.Player.Nickname] = player_type
 
         logging.info("Got {} colored players".format(len(colored_players)))
 
@@ -334,17 +413,18 @@ class AbstractStatisticCalculator(abc.ABC):
     def __get_stats__(self, files_to_calculate, calcmode, colored_players, regtables, reghands, interval, buyin):
         pass
 
-    def __is_reg__(self, nickname, colored_players, calcmode, regtables, reghands):
-        color_status = colored_players.get(nickname, None)
-        if color_status is not None:
-            return color_status == PlayerType.REG
-        player = self.players.get(nickname, None)
-        if player is None:
-            return False
+    def __get_reg_nicknames__(self, colored_players, calcmode, regtables, reghands):
         if calcmode == CalcMode.TABLES:
-            return player.tables >= regtables
+            regs = {nickname for nickname, player in self.players.items() if player.tables >= regtables}
         else:
-            return player.hands >= reghands
+            regs = {nickname for nickname, player in self.players.items() if player.hands >= reghands}
+        for nickname, color_status in colored_players.items():
+            if color_status == PlayerType.REG:
+                regs.add(nickname)
+            else:
+                regs.discard(nickname)
+
+        return frozenset(regs)
 
     def __get_stat_lines_header__(self, calcmode, regtables, reghands, interval, buyin):
         header_lines = []
@@ -428,7 +508,7 @@ class FullStatisticCalculator(AbstractStatisticCalculator):
 
     def calculate(self, calcmode, regtables, reghands, interval, buyin, is_sort, is_xa):
         logging.info("Run FULL stat calculation")
-        files_to_calculate = self.__get_calc_files__()
+        files_to_calculate = self.__get_calc_files__(interval)
         colored_players = self.__get_colored_players__()
         table_stats, report = self.__get_stats__(
             files_to_calculate, calcmode, colored_players, regtables, reghands, interval, buyin
@@ -437,33 +517,30 @@ class FullStatisticCalculator(AbstractStatisticCalculator):
         stat_lines = FullStatisticCalculator.__get_stat_lines__(table_stats, report, map_f=len)
         path_result_run = self.__generate_result_run_folder__()
         FullStatisticCalculator.__write_stats__(header_lines, stat_lines, path_result_run)
-        if is_sort:
-            FullStatisticCalculator.__copy_data_files__(table_stats, path_result_run)
-        if is_xa:
-            FullStatisticCalculator.__copy_xa_data_files__(table_stats, path_result_run)
+        if is_sort or is_xa:
+            FullStatisticCalculator.__copy_result_files__(table_stats, path_result_run, is_sort, is_xa)
         logging.info("Finish FULL stat calculation")
 
         return stat_lines
 
-    def __get_calc_files__(self):
+    def __get_calc_files__(self, interval):
         logging.info("Start getting files to calculate stat")
-        data_file_idx = defaultdict(set)
+        data_file_idx = defaultdict(list)
         tsdata_file_idx = {}
-        count = 0
-        for root, _, files in os.walk(self.path_calc_data):
-            for file in filter(is_data_file, files):
-                table_id = parse_table_id(file)
-                data_file_idx[table_id].add(os.path.join(root, file))
-                count += 1
-        logging.info("Data files to calculate stat: {} ".format(count))
+        data_files, tsdata_files = list_data_and_tsdata_files(
+            self.path_calc_data, self.path_calc_tsdata,
+            interval_folder_filter(self.path_calc_data, interval),
+            interval_folder_filter(self.path_calc_tsdata, interval)
+        )
+        for file, path in data_files:
+            table_id = parse_table_id(file)
+            data_file_idx[table_id].append(path)
+        logging.info("Data files to calculate stat: {} ".format(len(data_files)))
 
-        count = 0
-        for root, _, files in os.walk(self.path_calc_tsdata):
-            for file in filter(is_tsdata_file, files):
-                table_id = parse_table_id(file)
-                tsdata_file_idx[table_id] = os.path.join(root, file)
-                count += 1
-        logging.info("TS data files to calculate stat: {} ".format(count))
+        for file, path in tsdata_files:
+            table_id = parse_table_id(file)
+            tsdata_file_idx[table_id] = path
+        logging.info("TS data files to calculate stat: {} ".format(len(tsdata_files)))
 
         result = []
         for table_id, tsdata_file in tsdata_file_idx.items():
@@ -484,37 +561,34 @@ class FullStatisticCalculator(AbstractStatisticCalculator):
         filter_count = 0
         filter_out_count = 0
         not_found_count = 0
-        filters = [interval_filter(interval)] + ([] if buyin is None else [buyin_filter(buyin)])
-        regs = set()
-        report = FullStatisticCalculator.__generate_report_keys__()
+        match = table_filter(interval, buyin)
+        regs = self.__get_reg_nicknames__(colored_players, calcmode, regtables, reghands)
+        is_reg = regs.__contains__
+        report_slots = defaultdict(int)
 
         for file_to_calc in files_to_calculate:
             table = self.index.get(file_to_calc.id, None)
             if table is None:
                 not_found_count += 1
                 continue
-            if not all(map(lambda f: f(table), filters)):
+            if not match(table):
                 filter_out_count += 1
                 continue
 
-            reg = 0
-            fish = 0
-            for nickname in map(lambda player: player.nickname, table.players):
-                if nickname in regs:
-                    reg += 1
-                elif self.__is_reg__(nickname, colored_players, calcmode, regtables, reghands):
-                    regs.add(nickname)
-                    reg += 1
-                else:
-                    fish += 1
+            reg = sum(map(is_reg, table.player_nicknames))
+            fish = len(table.player_nicknames) - reg
             key = (reg, fish)
             xa_after_hand = -1 if table.xa.nickname in regs else table.xa.after_hand
             table_stats[key].append(
                 TableStat(file_to_calc, is_prize_pool_x2(table), xa_after_hand, table.lost_after_hand)
             )
-            FullStatisticCalculator.__add_to_report__(report, table, key)
+            report_slots[(FullStatisticCalculator.__get_report_slot__(table, self.local_tz), key)] += 1
             filter_count += 1
 
+        report = FullStatisticCalculator.__generate_report_keys__()
+        for (slot, key), count in report_slots.items():
+            FullStatisticCalculator.__add_to_report__(report, slot, key, count)
+
         logging.info("Tables to calculate stat: {}".format(filter_count))
         logging.info("Tables were filtered out: {}".format(filter_out_count))
         if not_found_count > 0:
@@ -550,30 +624,28 @@ class FullStatisticCalculator(AbstractStatisticCalculator):
         return Report(days, hours, threes, day_hours, day_threes, weeks)
 
     @staticmethod
-    def __add_to_report__(report, table, key):
-        timestamp_utc = datetime.strptime(table.table_data.timestamp, DATETIME_FORMAT).replace(tzinfo=timezone.utc)
-        local_tz = datetime.now().astimezone().tzinfo
-        table_timestamp = timestamp_utc.astimezone(local_tz)
-        day_name = table_timestamp.strftime('%A')
-        hour = table_timestamp.hour
-        three_hour = table_timestamp.hour // 3 * 3
-        week = table_timestamp.day // 7 + int(bool(table_timestamp.day % 7))
-        week = 4 if week > 4 else week
-
-        report.days[day_name][key] += 1
-        report.day_hours[(day_name, hour)][key] += 1
-        report.day_threes[(day_name, three_hour)][key] += 1
+    def __get_report_slot__(table, local_tz):
+        return get_report_slot(table.table_data.timestamp[:16], local_tz)
+
+    @staticmethod
+    def __add_to_report__(report, slot, key, count):
+        day_name, hour, week = slot
+        three_hour = hour // 3 * 3
+
+        report.days[day_name][key] += count
+        report.day_hours[(day_name, hour)][key] += count
+        report.day_threes[(day_name, three_hour)][key] += count
         if day_name in WEEKENDS:
-            report.days[WEEKEND][key] += 1
-            report.day_hours[(WEEKEND, hour)][key] += 1
-            report.day_threes[(WEEKEND, three_hour)][key] += 1
+            report.days[WEEKEND][key] += count
+            report.day_hours[(WEEKEND, hour)][key] += count
+            report.day_threes[(WEEKEND, three_hour)][key] += count
         else:
-            report.days[WEEKDAY][key] += 1
-            report.day_hours[(WEEKDAY, hour)][key] += 1
-            report.day_threes[(WEEKDAY, three_hour)][key] += 1
-        report.hours[hour][key] += 1
-        report.threes[three_hour][key] += 1
-        report.weeks[week][key] += 1
+            report.days[WEEKDAY][key] += count
+            report.day_hours[(WEEKDAY, hour)][key] += count
+            report.day_threes[(WEEKDAY, three_hour)][key] += count
+        report.hours[hour][key] += count
+        report.threes[three_hour][key] += count
+        report.weeks[week][key] += count
 
     def __generate_result_run_folder__(self):
         logging.info("Creating result folder...")
@@ -588,19 +660,27 @@ class FullStatisticCalculator(AbstractStatisticCalculator):
         logging.info("Creating stat file...")
         filename = os.path.join(path_result_run, STAT_FILE_NAME)
         with open(filename, "w", encoding="utf-8") as handler:
-            for line in header_lines:
-                handler.write(line)
-                handler.write("\n")
-            for line in stat_lines:
-                handler.write(line)
-                handler.write("\n")
+            handler.write("".join(line + "\n" for line in header_lines))
+            handler.write("".join(line + "\n" for line in stat_lines))
         logging.info("Created stat file")
 
     @staticmethod
-    def __copy_data_files__(table_stats, path_result_run):
-        logging.info("Copying data files...")
+    def __copy_result_files__(table_stats, path_result_run, is_sort, is_xa):
+        copies = {}
+        if is_sort:
+            FullStatisticCalculator.__add_data_file_copies__(table_stats, path_result_run, copies)
+        if is_xa:
+            FullStatisticCalculator.__add_xa_data_file_copies__(table_stats, path_result_run, copies)
+        logging.info("Copying {} files...".format(len(copies)))
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+            copy_files(executor, copies)
+        logging.info("Copied {} files".format(len(copies)))
+
+    @staticmethod
+    def __add_data_file_copies__(table_stats, path_result_run, copies):
+        logging.info("Collecting data files...")
         for (reg, fish), table_stat_buket in table_stats.items():
-            logging.info("Copying data files: reg={}, fish={}...".format(reg, fish))
+            logging.info("Collecting data files: reg={}, fish={}...".format(reg, fish))
             folder_name = REF_FISH_FOLDER_FORMAT.format(reg, fish)
             path_data_x2 = os.path.join(path_result_run, folder_name, "x2", "data")
             path_tsdata_x2 = os.path.join(path_result_run, folder_name, "x2", "tsdata")
@@ -613,59 +693,61 @@ class FullStatisticCalculator(AbstractStatisticCalculator):
             mod = statistic_mod(len(table_stat_buket))
             for i, table_stat in enumerate(table_stat_buket):
                 if i % mod == 0:
-                    logging.info("Copying data files fox x2 and rest {}/{}...".format(i, len(table_stat_buket)))
+                    logging.info("Collecting data files fox x2 and rest {}/{}...".format(i, len(table_stat_buket)))
                 path_data, path_tsdata = (
                     (path_data_x2, path_tsdata_x2) if table_stat.is_x2 else (path_data_rest, path_tsdata_rest)
                 )
-                copy_tsdata_file = os.path.join(path_tsdata, table_stat.file_meta.tsdata_file.split(os.sep)[-1])
-                copyfile(table_stat.file_meta.tsdata_file, copy_tsdata_file)
-                for data_file in table_stat.file_meta.data_files:
-                    copy_data_file = os.path.join(path_data, data_file.split(os.sep)[-1])
-                    copyfile(data_file, copy_data_file)
-            logging.info("Copied data files: reg={}, fish={}".format(reg, fish))
+                add_table_copies(copies, table_stat, path_data, path_tsdata)
 
-        logging.info("Copied data files")
+        logging.info("Collected data files")
 
     @staticmethod
-    def __copy_xa_data_files__(table_stats, path_result_run):
-        logging.info("Copying data files for XA...")
+    def __add_xa_data_file_copies__(table_stats, path_result_run, copies):
+        logging.info("Collecting data files for XA...")
         xa_fish_filter_out_count, xa_lost_filter_out_count = 0, 0
         for (reg, fish), table_stat_buket in table_stats.items():
-            logging.info("Copying data files for XA: reg={}, fish={}...".format(reg, fish))
+            logging.info("Collecting data files for XA: reg={}, fish={}...".format(reg, fish))
             folder_name = REF_FISH_FOLDER_FORMAT.format(reg, fish)
             xa_folder_name = os.path.join(path_result_run, folder_name, "xa")
 
             table_stats_with_xa = list(filter(xa_filter, table_stat_buket))
             xa_fish_filter_out_count += len(table_stat_buket) - len(table_stats_with_xa)
-            FullStatisticCalculator.__copy_xa_type_data_files__(table_stats_with_xa, xa_folder_name, XAType.FISH)
+            FullStatisticCalculator.__add_xa_type_data_file_copies__(
+                table_stats_with_xa, xa_folder_name, XAType.FISH, copies
+            )
 
             table_stats_with_lost = list(filter(xa_lost_filter, table_stat_buket))
             xa_lost_filter_out_count += len(table_stat_buket) - len(table_stats_with_lost)
-            FullStatisticCalculator.__copy_xa_type_data_files__(table_stats_with_lost, xa_folder_name, XAType.LOST)
-
-            logging.info("Copied data files for XA: reg={}, fish={}".format(reg, fish))
+            FullStatisticCalculator.__add_xa_type_data_file_copies__(
+                table_stats_with_lost, xa_folder_name, XAType.LOST, copies
+            )
 
         logging.info("File entries for XA fish were filtered out: {}".format(xa_fish_filter_out_count))
         logging.info("File entries for XA lost were filtered out: {}".format(xa_lost_filter_out_count))
-        logging.info("Copied data files for XA")
+        logging.info("Collected data files for XA")
 
     @staticmethod
-    def __copy_xa_type_data_files__(table_stat_buket, xa_folder_name, xa_type):
+    def __add_xa_type_data_file_copies__(table_stat_buket, xa_folder_name, xa_type, copies):
         folder_name = os.path.join(xa_folder_name, xa_type.value)
+        folder_bucket_paths = {}
         mod = statistic_mod(len(table_stat_buket))
         for i, table_stat in enumerate(table_stat_buket):
             folder_bucket_name = get_folder_bucket_name(table_stat, xa_type)
-            path_data = os.path.join(folder_name, folder_bucket_name, "data")
-            path_tsdata = os.path.join(folder_name, folder_bucket_name, "tsdata")
-            os.makedirs(path_data, exist_ok=True)
-            os.makedirs(path_tsdata, exist_ok=True)
+            paths = folder_bucket_paths.get(folder_bucket_name)
+            if paths is None:
+                paths = (
+                    os.path.join(folder_name, folder_bucket_name, "data"),
+                    os.path.join(folder_name, folder_bucket_name, "tsdata")
+                )
+                for path in paths:
+                    os.makedirs(path, exist_ok=True)
+                folder_bucket_paths[folder_bucket_name] = paths
+            path_data, path_tsdata = paths
             if i % mod == 0:
-                logging.info("Copying data files for XA '{}' {}/{}...".format(xa_type.value, i, len(table_stat_buket)))
-            copy_tsdata_file = os.path.join(path_tsdata, table_stat.file_meta.tsdata_file.split(os.sep)[-1])
-            copyfile(table_stat.file_meta.tsdata_file, copy_tsdata_file)
-            for data_file in table_stat.file_meta.data_files:
-                copy_data_file = os.path.join(path_data, data_file.split(os.sep)[-1])
-                copyfile(data_file, copy_data_file)
+                logging.info(
+                    "Collecting data files for XA '{}' {}/{}...".format(xa_type.value, i, len(table_stat_buket))
+                )
+            add_table_copies(copies, table_stat, path_data, path_tsdata)
 
 
 class FastStatisticCalculator(AbstractStatisticCalculator):
@@ -673,10 +755,12 @@ class FastStatisticCalculator(AbstractStatisticCalculator):
     def __init__(self, calcdata, calctsdata, colormarkers, result, original_interval, current_interval, nicknames):
         super().__init__(calcdata, calctsdata, colormarkers, result, original_interval, current_interval)
         self.self_nicknames = nicknames
+        self.calc_folder_cache = {}
+        self.data_file_tables = {}
 
     def calculate(self, calcmode, regtables, reghands, interval, buyin):
         logging.info("Run FAST stat calculation")
-        files_to_calculate = self.__get_calc_files__()
+        files_to_calculate = self.__get_calc_files__(interval)
         colored_players = self.__get_colored_players__()
         table_stats = self.__get_stats__(
             files_to_calculate, calcmode, colored_players, regtables, reghands, interval, buyin
@@ -687,15 +771,17 @@ class FastStatisticCalculator(AbstractStatisticCalculator):
 
         return header_lines, stat_lines
 
-    def __get_calc_files__(self):
+    def __get_calc_files__(self, interval):
         logging.info("Start getting files to calculate stat")
-        data_file_idx = defaultdict(set)
+        data_file_idx = defaultdict(list)
         count = 0
-        for root, _, files in os.walk(self.path_calc_data):
-            for file in filter(is_data_file, files):
-                table_id = parse_table_id(file)
-                data_file_idx[table_id].add(os.path.join(root, file))
-                count += 1
+        for file, path in iter_files_parallel(
+            self.path_calc_data, is_data_file, interval_folder_filter(self.path_calc_data, interval),
+            self.calc_folder_cache
+        ):
+            table_id = parse_table_id(file)
+            data_file_idx[table_id].append(path)
+            count += 1
         logging.info("Data files to calculate stat: {} ".format(count))
 
         result = []
@@ -710,12 +796,13 @@ class FastStatisticCalculator(AbstractStatisticCalculator):
     def __get_stats__(self, files_to_calculate, calcmode, colored_players, regtables, reghands, interval, buyin):
         logging.info("Start getting table stats")
 
-        table_stats = Counter()
+        table_stats = defaultdict(int)
         filter_count = 0
         filter_out_count = 0
         not_found_count = 0
-        filters = [interval_filter(interval)] + ([] if buyin is None else [buyin_filter(buyin)])
-        regs = set()
+        match = table_filter(interval, buyin)
+        regs = self.__get_reg_nicknames__(colored_players, calcmode, regtables, reghands)
+        is_reg = regs.__contains__
 
         mod = statistic_mod(len(files_to_calculate))
         for i, file_to_calc in enumerate(files_to_calculate):
@@ -724,21 +811,13 @@ class FastStatisticCalculator(AbstractStatisticCalculator):
             table = self.index.get(file_to_calc.id, None)
             if table is None:
                 not_found_count += 1
-                table = self.__get_table_from_data_file__(file_to_calc)
-            if not all(map(lambda f: f(table), filters)):
+                table = self.__get_cached_table_from_data_file__(file_to_calc)
+            if not match(table):
                 filter_out_count += 1
                 continue
 
-            reg = 0
-            fish = 0
-            for nickname in map(lambda player: player.nickname, table.players):
-                if nickname in regs:
-                    reg += 1
-                elif self.__is_reg__(nickname, colored_players, calcmode, regtables, reghands):
-                    regs.add(nickname)
-                    reg += 1
-                else:
-                    fish += 1
+            reg = sum(map(is_reg, table.player_nicknames))
+            fish = len(table.player_nicknames) - reg
             key = (reg, fish)
             table_stats[key] += 1
             filter_count += 1
@@ -750,32 +829,43 @@ class FastStatisticCalculator(AbstractStatisticCalculator):
 
         return table_stats
 
-    def __get_table_from_data_file__(self, file_to_calc):
-        data_file = list(sorted_data_files(file_to_calc.data_files))[0]
-        with open(data_file, encoding="utf-8") as handler:
-            lines = handler.readlines()
-        i = 0
-        while i < len(lines) and not bool(lines[i].strip()):
-            i += 1
-        timestamp, buy_in = parse_data_line(lines[i])
-        while i < len(lines) and not lines[i].startswith("Seat"):
-            i += 1
+    def __get_cached_table_from_data_file__(self, file_to_calc):
+        data_file = min(file_to_calc.data_files, key=data_file_sort_key)
+        mtime = os.stat(data_file).st_mtime_ns
+        cached = self.data_file_tables.get(data_file)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        table = self.__get_table_from_data_file__(file_to_calc.id, data_file)
+        self.data_file_tables[data_file] = (mtime, table)
+        return table
+
+    def __get_table_from_data_file__(self, table_id, data_file):
+        data = None
         players = set()
-        while i < len(lines) and lines[i].startswith("Seat"):
-            nickname = parse_nickname(lines[i])
-            if nickname not in self.self_nicknames:
-                players.add(nickname)
-            i += 1
-
+        state = HandState.PRE
+        with open(data_file, "rb", buffering=READ_BUFFER_SIZE) as handler:
+            for line in handler:
+                if data is None:
+                    if not line.strip():
+                        continue
+                    data = parse_data_line(line.decode("utf-8"))
+                if line.startswith(b"Seat"):
+                    state = HandState.SEATS
+                    nickname = parse_nickname(line.decode("utf-8"))
+                    if nickname not in self.self_nicknames:
+                        players.add(nickname)
+                elif state == HandState.SEATS:
+                    break
+
+        timestamp, buy_in = data
         table_data = TableData(timestamp, 0, buy_in)
-        players = [Player(nickname, 0) for nickname in players]
-        return TableFast(file_to_calc.id, table_data, players)
+        return TableFast(table_id, table_data, tuple(players))
 
 
 def serialize_table(table):
     players = []
-    for i, player in enumerate(table.players):
-        players.append("{}:{}".format(player.nickname, player.hands))
+    for nickname, hands in zip(table.player_nicknames, table.player_hands):
+        players.append("{}:{}".format(nickname, hands))
     return "{}|{}|{}|{}|{}|{}:{}|{}".format(
         table.id,
         table.table_data.timestamp,
@@ -791,14 +881,39 @@ def serialize_table(table):
 def deserialize_table(line):
     table_id, timestamp, prize_pool, buy_in, players_str, xa_str, lost_after_hand = line.split("|")
     table_data = TableData(timestamp, float(prize_pool), float(buy_in))
-    players = []
+    player_nicknames = []
+    player_hands = array("q")
     for player in players_str.split(","):
-        nickname, hands = player.split(":")
-        players.append(Player(nickname.strip(), int(hands.strip())))
-    xa_nickname, xa_after_hands = xa_str.split(":")
-    xa = XA(xa_nickname.strip(), int(xa_after_hands.strip()))
+        nickname, hands = player.rsplit(":", 1)
+        player_nicknames.append(sys.intern(nickname.strip()))
+        player_hands.append(int(hands))
+    xa_nickname, xa_after_hands = xa_str.rsplit(":", 1)
+    xa = XA(sys.intern(xa_nickname.strip()), int(xa_after_hands))
 
-    return Table(int(table_id), table_data, players, xa, int(lost_after_hand))
+    return Table(int(table_id), table_data, tuple(player_nicknames), player_hands, xa, int(lost_after_hand))
+
+
+def table_to_record(table):
+    return (
+        table.id,
+        table.table_data.timestamp,
+        table.table_data.prize_pool,
+        table.table_data.buy_in,
+        table.player_nicknames,
+        table.player_hands,
+        table.xa.nickname,
+        table.xa.after_hand,
+        table.lost_after_hand
+    )
+
+
+def record_to_table(record):
+    table_id, timestamp, prize_pool, buy_in, nicknames, hands, xa_nickname, xa_after_hand, lost_after_hand = record
+    table_data = TableData(timestamp, prize_pool, buy_in)
+    player_nicknames = tuple(sys.intern(nickname) for nickname in nicknames)
+    xa = XA(sys.intern(xa_nickname), xa_after_hand)
+
+    return Table(table_id, table_data, player_nicknames, hands, xa, lost_after_hand)
 
 
 def serialize_indexed_player(index_player):
@@ -811,23 +926,122 @@ def serialize_indexed_player(index_player):
 
 def deserialized_indexed_player(line):
     nickname, tables, hands = line.split("|")
-    return IndexedPlayer(nickname.strip(), int(tables), int(hands))
+    return IndexedPlayer(sys.intern(nickname.strip()), int(tables), int(hands))
 
 
 def sorted_data_files(data_files):
-    sorted_tuples = sorted(tuple(map(parse_int, data_file.split(os.sep))) for data_file in data_files)
-    if is_windows():
-        return map(lambda tup: os.path.join(str(tup[0]), os.sep, *map(str, tup[1:])), sorted_tuples)
-    else:
-        return map(lambda tup: os.path.join(*map(str, tup)), sorted_tuples)
+    return sorted(data_files, key=data_file_sort_key)
+
+
+def data_file_sort_key(data_file):
+    return tuple(int(part) if part.isdecimal() else part for part in data_file.split(os.sep))
+
+
+def add_table_copies(copies, table_stat, path_data, path_tsdata):
+    tsdata_file = table_stat.file_meta.tsdata_file
+    copies[os.path.join(path_tsdata, os.path.basename(tsdata_file))] = tsdata_file
+    for data_file in table_stat.file_meta.data_files:
+        copies[os.path.join(path_data, os.path.basename(data_file))] = data_file
+
+
+def copy_files(executor, copies):
+    destinations = defaultdict(list)
+    for dst, src in copies.items():
+        destinations[src].append(dst)
+    for _ in executor.map(copy_file_to_all, destinations.keys(), destinations.values()):
+        pass
+
+
+def copy_file_to_all(src, dsts):
+    if len(dsts) == 1:
+        copyfile(src, dsts[0])
+        return
+    with open(src, "rb") as handler:
+        content = handler.read()
+    for dst in dsts:
+        with open(dst, "wb") as handler:
+            handler.write(content)
 
 
 def get_folder_bucket_name(table_stat, xa_type):
     return str(table_stat.xa_after_hand if xa_type == XAType.FISH else table_stat.lost_after_hand)
 
 
-def is_windows():
-    return os.name == "nt"
+def scan_folder(path, predicate, folder_filter=None, cache=None):
+    if cache is None:
+        files, folders = read_folder(path, predicate)
+    else:
+        files, folders = read_folder_cached(path, predicate, cache)
+    if folder_filter is not None:
+        folders = [folder for folder in folders if folder_filter(folder)]
+    return files, folders
+
+
+def read_folder(path, predicate):
+    files, folders = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        folders.append(entry.path)
+                elif predicate(entry.name):
+                    files.append((entry.name, entry.path))
+    except OSError:
+        pass
+    return files, folders
+
+
+def read_folder_cached(path, predicate, cache):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return [], []
+    cached = cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1], cached[2]
+    files, folders = read_folder(path, predicate)
+    cache[path] = (mtime, files, folders)
+    return files, folders
+
+
+def iter_files(path, predicate, folder_filter=None, cache=None):
+    files, folders = scan_folder(path, predicate, folder_filter, cache)
+    yield from files
+    for folder in folders:
+        yield from iter_files(folder, predicate, folder_filter, cache)
+
+
+def list_files(path, predicate, folder_filter, cache):
+    return list(iter_files(path, predicate, folder_filter, cache))
+
+
+def submit_file_scans(executor, path, predicate, folder_filter, cache, depth):
+    files, folders = scan_folder(path, predicate, folder_filter, cache)
+    segments = [files]
+    for folder in folders:
+        if depth > 1:
+            segments.extend(submit_file_scans(executor, folder, predicate, folder_filter, cache, depth - 1))
+        else:
+            segments.append(executor.submit(list_files, folder, predicate, folder_filter, cache))
+    return segments
+
+
+def iter_files_parallel(path, predicate, folder_filter=None, cache=None):
+    with ThreadPoolExecutor(max_workers=WALK_WORKERS) as executor:
+        for segment in submit_file_scans(executor, path, predicate, folder_filter, cache, WALK_DEPTH):
+            yield from segment.result() if isinstance(segment, Future) else segment
+
+
+def list_files_parallel(path, predicate, folder_filter=None):
+    return list(iter_files_parallel(path, predicate, folder_filter))
+
+
+def list_data_and_tsdata_files(path_data, path_tsdata, data_folder_filter=None, tsdata_folder_filter=None):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        data_files = executor.submit(list_files_parallel, path_data, is_data_file, data_folder_filter)
+        tsdata_files = executor.submit(list_files_parallel, path_tsdata, is_tsdata_file, tsdata_folder_filter)
+        return data_files.result(), tsdata_files.result()
 
 
 def is_data_file(file):
@@ -843,7 +1057,7 @@ def is_color_marker_file(file):
 
 
 def parse_table_id(file):
-    return int(file.split("(")[1].split(")")[0])
+    return int(TABLE_ID_PATTERN.search(file).group(1))
 
 
 def parse_buy_in(line):
@@ -863,24 +1077,87 @@ def parse_tournament_started(line):
     return "{} {}".format(line_split[2].strip(), line_split[3].strip())
 
 
+def parse_utc_timestamp(timestamp):
+    return datetime(
+        int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]),
+        int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19]),
+        tzinfo=timezone.utc
+    )
+
+
+@lru_cache(maxsize=REPORT_SLOT_CACHE_SIZE)
+def get_report_slot(timestamp_minute, local_tz):
+    table_timestamp = parse_utc_timestamp(timestamp_minute + ":00").astimezone(local_tz)
+    week = table_timestamp.day // 7 + int(bool(table_timestamp.day % 7))
+    week = 4 if week > 4 else week
+    return table_timestamp.strftime('%A'), table_timestamp.hour, week
+
+
 def parse_data_line(line):
-    line_split = line.split()
-    timestamp = "{} {}".format(line_split[-3].strip(), line_split[-2].strip())
-    i = line_split.index("buyIn:")
-    buy_in = parse_price(line_split[i + 1]) + parse_price(line_split[i + 3])
-    return timestamp, buy_in
+    match = DATA_LINE_PATTERN.search(line)
+    if match is None:
+        line_split = line.split()
+        timestamp = "{} {}".format(line_split[-3], line_split[-2])
+        i = line_split.index("buyIn:")
+        buy_in = parse_price(line_split[i + 1]) + parse_price(line_split[i + 3])
+        return timestamp, buy_in
+    buy_in, rake, date, time = match.groups()
+    return "{} {}".format(date, time), parse_price(buy_in) + parse_price(rake)
 
 
 def parse_nickname(line):
-    return " ".join(line.strip().split()[2:-1])
+    return sys.intern(" ".join(line.split()[2:-1]))
 
 
-def interval_filter(interval):
-    return lambda table: interval[0] <= table.table_data.timestamp <= interval[1]
+def interval_folder_filter(root, interval):
+    start = get_folder_date_bound(interval[0], -FOLDER_DATE_MARGIN_DAYS)
+    end = get_folder_date_bound(interval[1], FOLDER_DATE_MARGIN_DAYS)
+    bounds = [(date_key(start[:depth]), date_key(end[:depth])) for depth in range(1, len(start) + 1)]
+    root_name = os.path.basename(os.path.normpath(root))
+    root_parts = [root_name] if is_date_folder_chain([root_name]) else []
+    root_length = len(os.path.join(root, ""))
 
+    def folder_filter(folder):
+        parts = root_parts + folder[root_length:].split(os.sep)
+        if len(parts) > len(bounds) or not is_date_folder_chain(parts):
+            return True
+        start_key, end_key = bounds[len(parts) - 1]
+        return start_key <= date_key(map(int, parts)) <= end_key
 
-def buyin_filter(buyin):
-    return lambda table: int(table.table_data.buy_in) == int(buyin)
+    return folder_filter
+
+
+def is_date_folder_chain(parts):
+    year, *rest = parts
+    if len(year) != 4 or not year.isdecimal() or int(year) not in FOLDER_YEARS:
+        return False
+    return all(
+        len(part) <= 2 and part.isdecimal() and 1 <= int(part) <= limit
+        for part, limit in zip(rest, FOLDER_DATE_LIMITS)
+    )
+
+
+def date_key(parts):
+    key = 0
+    for part in parts:
+        key = key * 100 + part
+    return key
+
+
+def get_folder_date_bound(timestamp, days):
+    try:
+        date = datetime.strptime(timestamp[:10], "%Y/%m/%d") + timedelta(days=days)
+    except (ValueError, OverflowError):
+        return (0, 0, 0) if days < 0 else (9999, 12, 31)
+    return date.year, date.month, date.day
+
+
+def table_filter(interval, buyin):
+    start, end = interval
+    if buyin is None:
+        return lambda table: start <= table.table_data.timestamp <= end
+    buyin = int(buyin)
+    return lambda table: start <= table.table_data.timestamp <= end and int(table.table_data.buy_in) == buyin
 
 
 def xa_filter(table_stat):
@@ -908,7 +1185,7 @@ def parse_calcmode(mode):
 
 
 def parse_nicknames(names):
-    return set(map(lambda name: name.strip(), names.split(",")))
+    return set(map(lambda name: sys.intern(name.strip()), names.split(",")))
 
 
 def parse_interval(interval):
@@ -954,13 +1231,6 @@ def parse_bool(value):
     raise ValueError("Cannot parse bool value: {}".format(value))
 
 
-def parse_int(s):
-    try:
-        return int(s)
-    except ValueError:
-        return s
-
-
 def parse_buyin(buyin):
     if buyin == "all":
         return None
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+from regfish import interval_folder_filter, iter_files
+
+INTERVAL = ("2024/01/10 00:00:00", "2024/01/20 23:59:59")
+FILE_NAME = "Expresso Nitro(1)_real_holdem_no-limit.txt"
+FOLDERS = (
+    "2024/01/15", "2024/01/15/1500", "2024/1/9", "2024/0110", "2024/03/02", "2023/12/31",
+    "0715", "archive/12345", "notes"
+)
+
+
+class IntervalFolderFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.temp_dir.name, "data")
+        for folder in FOLDERS:
+            path = os.path.join(self.root, *folder.split("/"))
+            os.makedirs(path)
+            with open(os.path.join(path, FILE_NAME), "w", encoding="utf-8"):
+                pass
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_folders(self, root):
+        files = iter_files(root, lambda name: True, interval_folder_filter(root, INTERVAL))
+        return sorted(os.path.relpath(os.path.dirname(path), self.root) for _, path in files)
+
+    def get_expected(self, *folders):
+        return sorted(os.path.join(*folder.split("/")) for folder in folders)
+
+    def test_data_root(self):
+        self.assertEqual(
+            self.get_folders(self.root),
+            self.get_expected(
+                "2024/01/15", "2024/01/15/1500", "2024/1/9", "2024/0110", "0715", "archive/12345", "notes"
+            )
+        )
+
+    def test_year_root(self):
+        self.assertEqual(
+            self.get_folders(os.path.join(self.root, "2024")),
+            self.get_expected("2024/01/15", "2024/01/15/1500", "2024/1/9", "2024/0110")
+        )
+
+    def test_non_year_numeric_root(self):
+        self.assertEqual(self.get_folders(os.path.join(self.root, "0715")), ["0715"])
+
+    def test_all_interval(self):
+        folder_filter = interval_folder_filter(self.root, ("0000/00/00", "2099/01/01"))
+        files = iter_files(self.root, lambda name: True, folder_filter)
+        self.assertEqual(len(list(files)), len(FOLDERS))
+
+
+if __name__ == "__main__":
+    unittest.main()